@@ -1,15 +1,49 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-from pylandtemp.utils import rescale_band, cavity_effect, fractional_vegetation_cover
+from pylandtemp.utils import rescale_band, fractional_vegetation_cover
+from pylandtemp.emissivity.kernels import (
+    mono_window_kernel,
+    nbem_kernel,
+    gopinadh_kernel,
+)
+
+# Thread pools for the tiled implementations, created once per size and reused by every call
+_executors = {}
+
+# A forked child inherits the pools but none of their worker threads, so it starts afresh
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_executors.clear)
+
+
+def _get_executor(num_workers):
+    if num_workers not in _executors:
+        _executors[num_workers] = ThreadPoolExecutor(max_workers=num_workers)
+    return _executors[num_workers]
 
 
 class Emissivity:
     def __init__(self):
-        """Parent class for all emissivity methods. Contains general methods and attributes"""
+        """Parent class for all emissivity methods. Contains general methods and attributes
+
+        Outputs keep the floating point dtype of the NDVI image. float32 inputs are the
+        fast path: they halve the memory traffic of these bandwidth-bound computations.
+        """
         self.ndvi_min = -1
         self.ndvi_max = 1
         self.baresoil_ndvi_max = 0.2
         self.vegatation_ndvi_min = 0.5
+        self.landcover_labels = {"baresoil": 1, "mixed": 2, "vegetation": 3}
+        # Number of pixels in the blocks the numpy implementations work on, sized so
+        # the inputs and intermediates of a block stay resident in L2 cache.
+        self.tile_pixels = 256 * 256
+        # Tiles are independent and numpy releases the GIL, so they run on a thread pool
+        self.num_workers = os.cpu_count() or 1
+        # Optional precomputed landcover labels and FVC of the whole image, see __call__
+        self.landcover = None
+        self.fvc = None
 
     def __call__(self, **kwargs) -> np.ndarray:
         """Computes the emissivity
@@ -18,7 +52,15 @@ class Emissivity:
         **ndvi (np.ndarray): NDVI image
         **red_band (np.ndarray): Band 4 or Red band image.
         **mask (np.ndarray[bool]): Mask image. Output will have NaN value where mask is True.
-
+        **dtype (np.dtype, optional): np.float32 or np.float64, the dtype to cast the NDVI
+            image to before the computation. Defaults to the dtype of the NDVI image, or
+            np.float64 if that is not a float32 or float64 dtype.
+        **landcover (np.ndarray[uint8], optional): Landcover labels of the NDVI image, as
+            returned by shared_intermediates. Computed from the NDVI image if not provided.
+        **fvc (np.ndarray, optional): Fractional vegetation cover of the NDVI image, as
+            returned by shared_intermediates. Computed from the NDVI image if not provided.
+            Both are only used by the numpy implementations: the compiled kernels derive
+            them per pixel and ignore these arguments.
 
         Returns:
             Tuple(np.ndarray, np.ndarray): Emissivity for bands 10 and 11 respectively
@@ -29,57 +71,176 @@ class Emissivity:
         if "red_band" not in kwargs:
             raise ValueError("Band 4 (red band) image is not provided")
 
-        self.ndvi = kwargs["ndvi"]
-        self.red_band = kwargs["red_band"]
+        ndvi = kwargs["ndvi"]
+        red_band = kwargs["red_band"]
 
-        if (
-            self.ndvi is not None
-            and self.red_band is not None
-            and self.ndvi.shape != self.red_band.shape
-        ):
+        if ndvi is None or ndvi.ndim != 2:
+            raise ValueError("NDVI image should be 2-dimensional")
+
+        if red_band is not None and ndvi.shape != red_band.shape:
             raise ValueError(
                 "Input images (NDVI and Red band) must be of equal dimension"
             )
 
-        emm_10, emm_11 = self._compute_emissivity()
-        mask = emm_10 == 0
-        emm_10[mask] = np.nan
-        if emm_11 is not None:
-            emm_11[mask] = np.nan
-        return emm_10, emm_11
+        # Both the compiled kernels and the tiles stream over C-contiguous images.
+        # Inputs that already match are used as is, without a copy.
+        self.ndvi = np.ascontiguousarray(
+            ndvi, dtype=self._get_dtype(ndvi, kwargs.get("dtype"))
+        )
+        self.red_band = None if red_band is None else np.ascontiguousarray(red_band)
+
+        self.landcover = kwargs.get("landcover")
+        self.fvc = kwargs.get("fvc")
+        for image in (self.landcover, self.fvc):
+            if image is not None and image.shape != ndvi.shape:
+                raise ValueError(
+                    "Precomputed landcover and FVC images must match the NDVI image dimension"
+                )
+        if self.fvc is not None:
+            self.fvc = np.ascontiguousarray(self.fvc, dtype=self.ndvi.dtype)
+
+        # Every implementation already returns NaN for NaN NDVI. The landcover methods
+        # also return NaN for out of range NDVI, while Gopinadh stays finite there.
+        return self._compute_emissivity()
+
+    def shared_intermediates(self, ndvi, dtype=None):
+        """Computes the intermediates that every numpy implementation derives from the
+        NDVI image, so that several methods run on the same image compute them once.
+
+        The compiled kernels compute them per pixel instead, so nothing is shared when
+        numba is installed and an empty dict is returned.
+
+        Args:
+            ndvi (np.ndarray): NDVI image
+            dtype (np.dtype, optional): dtype the methods will be called with, see __call__
+
+        Returns:
+            dict: landcover and fvc keyword arguments to pass to every method call
+        """
+        if mono_window_kernel is not None:
+            return {}
+        ndvi = np.ascontiguousarray(ndvi, dtype=self._get_dtype(ndvi, dtype))
+        return {
+            "landcover": self._get_land_surface_mask(ndvi),
+            "fvc": fractional_vegetation_cover(ndvi),
+        }
+
+    def _get_dtype(self, ndvi, dtype):
+        # Float dtype the computation runs in, see the dtype kwarg of __call__
+        if dtype is None:
+            return ndvi.dtype if ndvi.dtype in (np.float32, np.float64) else np.float64
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError(f"dtype must be float32 or float64, got {dtype}")
+        return dtype
 
     def _compute_emissivity(self):
         raise NotImplementedError("No concrete implementation of emissivity method yet")
 
-    def _get_land_surface_mask(self):
-        mask_baresoil = (self.ndvi >= self.ndvi_min) & (
-            self.ndvi < self.baresoil_ndvi_max
-        )
-        mask_vegetation = (self.ndvi > self.vegatation_ndvi_min) & (
-            self.ndvi <= self.ndvi_max
+    def _compute_tile(self, ndvi, red_band, window):
+        raise NotImplementedError("No concrete implementation of emissivity method yet")
+
+    def _compute_emissivity_tiled(self):
+        """Computes the emissivity block by block with _compute_tile so that every
+        intermediate image of a block is still in cache when it is reused. Blocks are
+        spread over num_workers threads.
+
+        Blocks are bands of whole rows, so each one is a contiguous slice of the C-ordered
+        inputs and outputs: reading and writing a block needs no strided gather or scatter.
+
+        Returns:
+            Tuple(np.ndarray, np.ndarray): Emissivity for bands 10 and 11 respectively
+        """
+        rows, cols = self.ndvi.shape
+        if self.ndvi.size <= self.tile_pixels:
+            return self._compute_tile(self.ndvi, self.red_band, slice(None))
+
+        tile_rows = max(1, self.tile_pixels // cols)
+        windows = [slice(i, i + tile_rows) for i in range(0, rows, tile_rows)]
+
+        def compute_window(window):
+            red_band = None if self.red_band is None else self.red_band[window]
+            return self._compute_tile(self.ndvi[window], red_band, window)
+
+        # The first block fixes the output dtypes, and whether both bands share one image
+        tile_10, tile_11 = compute_window(windows[0])
+        emm_10 = np.empty(self.ndvi.shape, dtype=tile_10.dtype)
+        emm_11 = (
+            emm_10
+            if tile_11 is tile_10
+            else np.empty(self.ndvi.shape, dtype=tile_11.dtype)
         )
-        mask_mixed = (self.ndvi >= self.baresoil_ndvi_max) & (
-            self.ndvi <= self.vegatation_ndvi_min
+
+        def write_window(window, tile_10, tile_11):
+            emm_10[window] = tile_10
+            if emm_11 is not emm_10:
+                emm_11[window] = tile_11
+
+        write_window(windows[0], tile_10, tile_11)
+
+        def run(window):
+            write_window(window, *compute_window(window))
+
+        if self.num_workers > 1:
+            # Consume the iterator so exceptions raised in workers propagate
+            list(_get_executor(self.num_workers).map(run, windows[1:]))
+        else:
+            for window in windows[1:]:
+                run(window)
+        return emm_10, emm_11
+
+    def _get_land_surface_mask(self, ndvi, window=None):
+        """Labels every pixel with its landcover class in a single pass over the NDVI image.
+
+        Args:
+            ndvi (np.ndarray): NDVI image or block
+            window (slice, optional): Rows of the block, used to read precomputed labels
+
+        Returns:
+            np.ndarray[uint8]: 1 for baresoil, 2 for mixed and 3 for vegetation pixels.
+                Pixels below ndvi_min are labelled 0, pixels above ndvi_max or NaN are labelled 4.
+        """
+        # The thresholds are kept in the NDVI dtype so searchsorted does not upcast the
+        # whole image. Mixed pixels are inclusive of both thresholds, so the upper edges
+        # are nudged to the next representable value to keep 0.5 and 1.0 in the lower class.
+        if window is not None and self.landcover is not None:
+            return self.landcover[window]
+        dtype = ndvi.dtype if ndvi.dtype.kind == "f" else np.dtype(np.float64)
+        bins = np.array(
+            [
+                self.ndvi_min,
+                self.baresoil_ndvi_max,
+                self.vegatation_ndvi_min,
+                self.ndvi_max,
+            ],
+            dtype=dtype,
         )
-        return {
-            "baresoil": mask_baresoil,
-            "vegetation": mask_vegetation,
-            "mixed": mask_mixed,
-        }
+        bins[2:] = np.nextafter(bins[2:], dtype.type(np.inf))
+        return np.searchsorted(bins, ndvi, side="right").astype(np.uint8)
 
-    def _get_landcover_mask_indices(self):
-        """Returns indices corresponding to the different landcover classes of of interest namely:
-        vegetation, baresoil and mixed"
+    def _choose_by_landcover(self, labels, baresoil, mixed, vegetation):
+        """Picks the baresoil, mixed or vegetation value of every pixel from its landcover
+        label in a single branchless pass. Out of range and NaN pixels are set to NaN.
+
+        Args:
+            labels (np.ndarray[uint8]): Landcover labels from _get_land_surface_mask
+            baresoil, mixed, vegetation (float or np.ndarray): Value per landcover class
         """
-        masks = self._get_land_surface_mask()
-        baresoil = np.where(masks["baresoil"])
-        vegetation = np.where(masks["vegetation"])
-        mixed = np.where(masks["mixed"])
-        return {"baresoil": baresoil, "vegetation": vegetation, "mixed": mixed}
+        choices = [np.nan] * 5
+        choices[self.landcover_labels["baresoil"]] = baresoil
+        choices[self.landcover_labels["mixed"]] = mixed
+        choices[self.landcover_labels["vegetation"]] = vegetation
+        return np.choose(labels, choices)
+
+    def _flatten(self, image):
+        # Contiguous 1-D view of an image, as expected by the compiled kernels.
+        return np.ascontiguousarray(image).ravel()
 
-    def _compute_fvc(self):
-        # Returns the fractional vegegation cover from the NDVI image.
-        return fractional_vegetation_cover(self.ndvi)
+    def _compute_fvc(self, ndvi, window=None):
+        # Returns the fractional vegegation cover from the NDVI image, or its precomputed
+        # rows. The precomputed image is shared between methods and must not be modified.
+        if window is not None and self.fvc is not None:
+            return self.fvc[window]
+        return fractional_vegetation_cover(ndvi)
 
 
 class ComputeMonoWindowEmissivity(Emissivity):
@@ -90,18 +251,36 @@ class ComputeMonoWindowEmissivity(Emissivity):
     emissivity_veg_11 = None
 
     def _compute_emissivity(self) -> np.ndarray:
-        emm = np.empty_like(self.ndvi)
-        landcover_mask_indices = self._get_landcover_mask_indices()
-
-        # Baresoil value assignment
-        emm[landcover_mask_indices["baresoil"]] = self.emissivity_soil_10
-        # Vegetation value assignment
-        emm[landcover_mask_indices["vegetation"]] = self.emissivity_veg_10
-        # Mixed value assignment
-        emm[landcover_mask_indices["mixed"]] = (
-            0.004
-            * (((self.ndvi[landcover_mask_indices["mixed"]] - 0.2) / (0.5 - 0.2)) ** 2)
-        ) + 0.986
+        if mono_window_kernel is not None:
+            emm = np.empty(self.ndvi.shape, dtype=self.ndvi.dtype)
+            mono_window_kernel(
+                self._flatten(self.ndvi),
+                self.ndvi_min,
+                self.baresoil_ndvi_max,
+                self.vegatation_ndvi_min,
+                self.ndvi_max,
+                self.emissivity_soil_10,
+                self.emissivity_veg_10,
+                emm.reshape(-1),
+            )
+            return emm, emm
+
+        return self._compute_emissivity_tiled()
+
+    def _compute_tile(self, ndvi, red_band, window):
+        labels = self._get_land_surface_mask(ndvi, window)
+
+        # The mixed-pixel polynomial is evaluated over the whole image so that every
+        # class is written in one contiguous pass rather than three masked scatters.
+        # It is built in a single scratch buffer to avoid raster-sized temporaries.
+        mixed = np.subtract(ndvi, 0.2)
+        np.divide(mixed, 0.5 - 0.2, out=mixed)
+        np.square(mixed, out=mixed)
+        np.multiply(mixed, 0.004, out=mixed)
+        np.add(mixed, 0.986, out=mixed)
+        emm = self._choose_by_landcover(
+            labels, self.emissivity_soil_10, mixed, self.emissivity_veg_10
+        )
         return emm, emm
 
 
@@ -124,6 +303,14 @@ class ComputeEmissivityNBEM(Emissivity):
     emissivity_soil_11 = 0.9747
     emissivity_veg_11 = 0.9896
 
+    # Baresoil emissivity is a - (b * red_band) for each thermal band
+    red_band_coeffs_10 = (0.973, 0.047)
+    red_band_coeffs_11 = (0.984, 0.026)
+    # (mult, add) factors used to rescale the red band before the baresoil equation
+    red_band_rescale = (2e-05, 0.1)
+    # Geometrical factor of the cavity effect
+    geometrical_factor = 0.55
+
     def _compute_emissivity(self) -> np.ndarray:
 
         if self.red_band is None:
@@ -133,62 +320,71 @@ class ComputeEmissivityNBEM(Emissivity):
                 )
             )
 
-        self.red_band = rescale_band(self.red_band)
-        landcover_mask_indices = self._get_landcover_mask_indices()
-        fractional_veg_cover = self._compute_fvc()
+        if nbem_kernel is not None:
+            emissivity_band_10 = np.empty(self.ndvi.shape, dtype=self.ndvi.dtype)
+            emissivity_band_11 = np.empty(self.ndvi.shape, dtype=self.ndvi.dtype)
+            nbem_kernel(
+                self._flatten(self.ndvi),
+                self._flatten(self.red_band),
+                self.ndvi_min,
+                self.baresoil_ndvi_max,
+                self.vegatation_ndvi_min,
+                self.ndvi_max,
+                self.emissivity_veg_10,
+                self.emissivity_soil_10,
+                self.emissivity_veg_11,
+                self.emissivity_soil_11,
+                self.red_band_coeffs_10 + self.red_band_coeffs_11,
+                *self.red_band_rescale,
+                self.geometrical_factor,
+                emissivity_band_10.reshape(-1),
+                emissivity_band_11.reshape(-1),
+            )
+            return emissivity_band_10, emissivity_band_11
+
+        return self._compute_emissivity_tiled()
+
+    def _compute_tile(self, ndvi, red_band, window):
+        # Rescale in the NDVI dtype so integer red bands don't promote to float64
+        red_band = rescale_band(
+            red_band.astype(ndvi.dtype, copy=False), *self.red_band_rescale
+        )
+        labels = self._get_land_surface_mask(ndvi, window)
+        # FVC is computed once and shared by both bands
+        fractional_veg_cover = self._compute_fvc(ndvi, window)
 
         def calc_emissivity_for_band(
-            image,
             emissivity_veg,
             emissivity_soil,
-            cavity_effect,
-            red_band_coeff_a=None,
-            red_band_coeff_b=None,
+            red_band_coeff_a,
+            red_band_coeff_b,
         ):
-            image[landcover_mask_indices["baresoil"]] = red_band_coeff_a - (
-                red_band_coeff_b * self.red_band[landcover_mask_indices["baresoil"]]
-            )
-
-            image[landcover_mask_indices["mixed"]] = (
-                (emissivity_veg * fractional_veg_cover[landcover_mask_indices["mixed"]])
-                + (
-                    emissivity_soil
-                    * (1 - fractional_veg_cover[landcover_mask_indices["mixed"]])
-                )
-                + cavity_effect[landcover_mask_indices["mixed"]]
+            # Each class expression is evaluated in place in its own buffer
+            baresoil = np.multiply(red_band, -red_band_coeff_b)
+            np.add(baresoil, red_band_coeff_a, out=baresoil)
+
+            # The cavity effect is c * (1 - fvc), so both the mixed term
+            # ev * fvc + es * (1 - fvc) + c * (1 - fvc) and the vegetation term
+            # ev + c * (1 - fvc) are affine in FVC and need no cavity effect image.
+            cavity = (1 - emissivity_soil) * emissivity_veg * self.geometrical_factor
+            mixed = np.multiply(
+                fractional_veg_cover, emissivity_veg - emissivity_soil - cavity
             )
+            np.add(mixed, emissivity_soil + cavity, out=mixed)
 
-            image[landcover_mask_indices["vegetation"]] = (
-                emissivity_veg + cavity_effect[landcover_mask_indices["vegetation"]]
-            )
-            return image
-
-        emissivity_band_10 = np.empty_like(self.ndvi)
-        emissivity_band_11 = np.empty_like(self.ndvi)
-        frac_vegetation_cover = self._compute_fvc()
-
-        cavity_effect_10 = cavity_effect(
-            self.emissivity_veg_10, self.emissivity_soil_10, fractional_veg_cover
-        )
-        cavity_effect_11 = cavity_effect(
-            self.emissivity_veg_11, self.emissivity_soil_11, fractional_veg_cover
-        )
+            vegetation = np.multiply(fractional_veg_cover, -cavity)
+            np.add(vegetation, emissivity_veg + cavity, out=vegetation)
+            return self._choose_by_landcover(labels, baresoil, mixed, vegetation)
 
         emissivity_band_10 = calc_emissivity_for_band(
-            emissivity_band_10,
             self.emissivity_veg_10,
             self.emissivity_soil_10,
-            cavity_effect_10,
-            red_band_coeff_a=0.973,
-            red_band_coeff_b=0.047,
+            *self.red_band_coeffs_10,
         )
         emissivity_band_11 = calc_emissivity_for_band(
-            emissivity_band_11,
             self.emissivity_veg_11,
             self.emissivity_soil_11,
-            cavity_effect_11,
-            red_band_coeff_a=0.984,
-            red_band_coeff_b=0.026,
+            *self.red_band_coeffs_11,
         )
         return emissivity_band_10, emissivity_band_11
 
@@ -208,30 +404,53 @@ class ComputeEmissivityGopinadh(Emissivity):
     emissivity_soil_11 = 0.977
     emissivity_veg_11 = 0.989
 
+    # es * (1 - fvc) + ev * fvc is evaluated as es + (ev - es) * fvc
+    emissivity_delta_10 = emissivity_veg_10 - emissivity_soil_10
+    emissivity_delta_11 = emissivity_veg_11 - emissivity_soil_11
+
     def _compute_emissivity(self) -> np.ndarray:
 
-        fractional_veg_cover = self._compute_fvc()
+        if gopinadh_kernel is not None:
+            emissivity_band_10 = np.empty(self.ndvi.shape, dtype=self.ndvi.dtype)
+            emissivity_band_11 = np.empty(self.ndvi.shape, dtype=self.ndvi.dtype)
+            gopinadh_kernel(
+                self._flatten(self.ndvi),
+                self.emissivity_delta_10,
+                self.emissivity_soil_10,
+                self.emissivity_delta_11,
+                self.emissivity_soil_11,
+                emissivity_band_10.reshape(-1),
+                emissivity_band_11.reshape(-1),
+            )
+            return emissivity_band_10, emissivity_band_11
+
+        return self._compute_emissivity_tiled()
+
+    def _compute_tile(self, ndvi, red_band, window):
+        fractional_veg_cover = self._compute_fvc(ndvi, window)
 
         def calc_emissivity_for_band(
-            image, emissivity_veg, emissivity_soil, fractional_veg_cover
+            image, emissivity_delta, emissivity_soil, fractional_veg_cover
         ):
-            emm = (emissivity_soil * (1 - fractional_veg_cover)) + (
-                emissivity_veg * fractional_veg_cover
-            )
-            return emm
+            np.multiply(fractional_veg_cover, emissivity_delta, out=image)
+            return np.add(image, emissivity_soil, out=image)
 
-        emissivity_band_10 = np.empty_like(self.ndvi)
         emissivity_band_10 = calc_emissivity_for_band(
-            emissivity_band_10,
-            self.emissivity_veg_10,
+            np.empty_like(fractional_veg_cover),
+            self.emissivity_delta_10,
             self.emissivity_soil_10,
             fractional_veg_cover,
         )
 
-        emissivity_band_11 = np.empty_like(self.ndvi)
+        # FVC is not needed after band 11, so band 11 is written over it unless the
+        # FVC was precomputed and is shared with other methods
         emissivity_band_11 = calc_emissivity_for_band(
-            emissivity_band_11,
-            self.emissivity_veg_11,
+            (
+                fractional_veg_cover
+                if self.fvc is None
+                else np.empty_like(fractional_veg_cover)
+            ),
+            self.emissivity_delta_11,
             self.emissivity_soil_11,
             fractional_veg_cover,
         )
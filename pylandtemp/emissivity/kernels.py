@@ -0,0 +1,141 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is an optional dependency
+    njit = None
+
+
+__all__ = [
+    "mono_window_kernel",
+    "nbem_kernel",
+    "gopinadh_kernel",
+]
+
+
+if njit is None:
+    mono_window_kernel = None
+    nbem_kernel = None
+    gopinadh_kernel = None
+
+else:
+    # 'nnan' is deliberately left out of the fastmath flags: NaN NDVI pixels must
+    # keep falling through the landcover comparisons and come out as NaN.
+    _jit = njit(
+        parallel=True,
+        fastmath={"nsz", "arcp", "contract", "afn", "reassoc"},
+        error_model="numpy",
+        cache=True,
+    )
+
+    @_jit
+    def mono_window_kernel(
+        ndvi,
+        ndvi_min,
+        baresoil_ndvi_max,
+        vegetation_ndvi_min,
+        ndvi_max,
+        emm_soil,
+        emm_veg,
+        out,
+    ):
+        """Per-pixel Avdan mono-window emissivity on flattened arrays.
+
+        Args:
+            ndvi (np.ndarray): Flattened NDVI image
+            ndvi_min, baresoil_ndvi_max, vegetation_ndvi_min, ndvi_max (float): landcover thresholds
+            emm_soil (float): Baresoil emissivity
+            emm_veg (float): Vegetation emissivity
+            out (np.ndarray): Flattened output buffer, same size as ndvi
+        """
+        for i in prange(ndvi.size):
+            v = ndvi[i]
+            if v >= ndvi_min and v < baresoil_ndvi_max:
+                out[i] = emm_soil
+            elif v > vegetation_ndvi_min and v <= ndvi_max:
+                out[i] = emm_veg
+            elif v >= baresoil_ndvi_max and v <= vegetation_ndvi_min:
+                t = (v - 0.2) / (0.5 - 0.2)
+                out[i] = 0.004 * t * t + 0.986
+            else:
+                out[i] = np.nan
+
+    @_jit
+    def nbem_kernel(
+        ndvi,
+        red_band,
+        ndvi_min,
+        baresoil_ndvi_max,
+        vegetation_ndvi_min,
+        ndvi_max,
+        emm_veg_10,
+        emm_soil_10,
+        emm_veg_11,
+        emm_soil_11,
+        red_band_coeffs,
+        rescale_mult,
+        rescale_add,
+        geometrical_factor,
+        out_10,
+        out_11,
+    ):
+        """Per-pixel NBEM emissivity for bands 10 and 11 on flattened arrays.
+
+        The red band rescaling, fractional vegetation cover and cavity effect are
+        computed inline so each input pixel is read once and each output written once.
+
+        Args:
+            ndvi (np.ndarray): Flattened NDVI image
+            red_band (np.ndarray): Flattened, unscaled red band image
+            ndvi_min, baresoil_ndvi_max, vegetation_ndvi_min, ndvi_max (float): landcover thresholds
+            emm_veg_10, emm_soil_10, emm_veg_11, emm_soil_11 (float): Endmember emissivities
+            red_band_coeffs (tuple): (a_10, b_10, a_11, b_11) baresoil red band coefficients
+            rescale_mult, rescale_add (float): Red band rescaling factors
+            geometrical_factor (float): Geometric factor of the cavity effect
+            out_10, out_11 (np.ndarray): Flattened output buffers, same size as ndvi
+        """
+        a_10, b_10, a_11, b_11 = red_band_coeffs
+        # The cavity effect is affine in fvc, so it is folded into the mixed and
+        # vegetation expressions exactly as the numpy path does.
+        cavity_10 = (1 - emm_soil_10) * emm_veg_10 * geometrical_factor
+        cavity_11 = (1 - emm_soil_11) * emm_veg_11 * geometrical_factor
+        for i in prange(ndvi.size):
+            v = ndvi[i]
+            if v >= ndvi_min and v < baresoil_ndvi_max:
+                red = (rescale_mult * red_band[i]) + rescale_add
+                out_10[i] = a_10 - (b_10 * red)
+                out_11[i] = a_11 - (b_11 * red)
+            elif v >= baresoil_ndvi_max and v <= ndvi_max:
+                t = (v - 0.2) / (0.5 - 0.2)
+                fvc = t * t
+                if v > vegetation_ndvi_min:
+                    out_10[i] = (emm_veg_10 + cavity_10) - (cavity_10 * fvc)
+                    out_11[i] = (emm_veg_11 + cavity_11) - (cavity_11 * fvc)
+                else:
+                    out_10[i] = (emm_soil_10 + cavity_10) + (
+                        (emm_veg_10 - emm_soil_10 - cavity_10) * fvc
+                    )
+                    out_11[i] = (emm_soil_11 + cavity_11) + (
+                        (emm_veg_11 - emm_soil_11 - cavity_11) * fvc
+                    )
+            else:
+                out_10[i] = np.nan
+                out_11[i] = np.nan
+
+    @_jit
+    def gopinadh_kernel(
+        ndvi, emm_delta_10, emm_soil_10, emm_delta_11, emm_soil_11, out_10, out_11
+    ):
+        """Per-pixel Gopinadh emissivity for bands 10 and 11 on flattened arrays.
+
+        Args:
+            ndvi (np.ndarray): Flattened NDVI image
+            emm_delta_10, emm_delta_11 (float): Vegetation minus soil emissivity
+            emm_soil_10, emm_soil_11 (float): Soil emissivities
+            out_10, out_11 (np.ndarray): Flattened output buffers, same size as ndvi
+        """
+        for i in prange(ndvi.size):
+            t = (ndvi[i] - 0.2) / (0.5 - 0.2)
+            fvc = t * t
+            out_10[i] = emm_soil_10 + (emm_delta_10 * fvc)
+            out_11[i] = emm_soil_11 + (emm_delta_11 * fvc)
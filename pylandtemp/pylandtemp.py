@@ -2,11 +2,17 @@ import numpy as np
 
 from .temperature import default_algorithms as temperature_algorithms
 from .emissivity import default_algorithms as emissivity_algorithms
+from .emissivity.algorithms import Emissivity
 from .temperature import BrightnessTemperatureLandsat
 from .runner import Runner
 from .utils import compute_ndvi
 from .exceptions import *
 
+# Dispatch tables are built once at import rather than on every call
+_emissivity_runner = Runner(algorithms=emissivity_algorithms)
+_split_window_runner = Runner(algorithms=temperature_algorithms.split_window)
+_single_window_runner = Runner(algorithms=temperature_algorithms.single_window)
+
 
 def split_window(
     landsat_band_10: np.ndarray,
@@ -16,6 +22,7 @@ def split_window(
     lst_method: str,
     emissivity_method: str,
     unit: str = "kelvin",
+    dtype=None,
 ) -> np.ndarray:
     """Provides an interface to compute land surface temperature
         from landsat 8 imagery using split window method
@@ -43,6 +50,9 @@ def split_window(
 
         unit (str, optional): 'kelvin' or 'celcius'. Defaults to 'kelvin'.
 
+        dtype (np.dtype, optional): np.float32 or np.float64, the dtype the emissivity is computed in.
+                                    Defaults to the dtype of the NDVI image.
+
     Returns:
         np.ndarray: Land surface temperature (numpy array)
     """
@@ -64,11 +74,11 @@ def split_window(
         landsat_band_10, landsat_band_11=landsat_band_11, mask=mask
     )
 
-    emissivity_10, emissivity_11 = Runner(algorithms=emissivity_algorithms)(
-        emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4
+    emissivity_10, emissivity_11 = _emissivity_runner(
+        emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4, dtype=dtype
     )
 
-    lst_image = Runner(algorithms=temperature_algorithms.split_window)(
+    lst_image = _split_window_runner(
         lst_method,
         emissivity_10=emissivity_10,
         emissivity_11=emissivity_11,
@@ -87,6 +97,7 @@ def single_window(
     lst_method: str = "mono-window",
     emissivity_method: str = "avdan",
     unit: str = "kelvin",
+    dtype=None,
 ) -> np.ndarray:
     """Provides an interface to compute land surface temperature
         from landsat 8 imagery using single window method
@@ -111,6 +122,9 @@ def single_window(
 
         unit (str, optional): 'celcius' or 'kelvin'. Defaults to 'kelvin'.
 
+        dtype (np.dtype, optional): np.float32 or np.float64, the dtype the emissivity is computed in.
+                                    Defaults to the dtype of the NDVI image.
+
     Returns:
         np.ndarray: Land surface temperature (numpy array)
     """
@@ -124,11 +138,11 @@ def single_window(
     ndvi_image = ndvi(landsat_band_5, landsat_band_4, mask)
     brightness_temp_10, _ = brightness_temperature(landsat_band_10, mask=mask)
 
-    emissivity_10, _ = Runner(algorithms=emissivity_algorithms)(
-        emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4
+    emissivity_10, _ = _emissivity_runner(
+        emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4, dtype=dtype
     )
 
-    lst_image = Runner(algorithms=temperature_algorithms.single_window)(
+    lst_image = _single_window_runner(
         lst_method,
         emissivity_10=emissivity_10,
         brightness_temperature_10=brightness_temp_10,
@@ -142,6 +156,7 @@ def emissivity(
     ndvi_image: np.ndarray,
     landsat_band_4: np.ndarray = None,
     emissivity_method: str = "avdan",
+    dtype=None,
 ):
     """Provides an interface to compute land surface emissivity
         from landsat 8 imagery
@@ -152,28 +167,48 @@ def emissivity(
         landsat_band_4 (None or np.ndarray, optional): red band image. Defaults to None.
                                                         Can be None except when emissivity_method = 'xiaolei'
 
-        emissivity_method (str, optional): provide one of the valid split window method for computing land surface emissivity.
+        emissivity_method (str or list[str], optional): provide one of the valid split window method for computing land surface emissivity.
                                             Defaults to 'avdan'.
+                                            A list of methods computes all of them, sharing intermediates
+                                            such as the landcover classes and fractional vegetation cover.
+                                            Nothing is shared when numba is installed, as the compiled
+                                            kernels compute these per pixel.
                                          Valid methods to add include:
                                         'advan': Avdan Ugur et al, 2016
                                         'xiaolei':  Xiaolei Yu et al, 2014
 
+        dtype (np.dtype, optional): np.float32 or np.float64, the dtype the emissivity is computed in.
+                                    Defaults to the dtype of the NDVI image.
+
     Returns:
-        np.ndarray: Emissivity numpy array
+        Tuple(np.ndarray, np.ndarray): Emissivity for bands 10 and 11 respectively, or a dict
+            mapping each method to this tuple when a list of methods is given.
     """
     if not ndvi_image.shape == landsat_band_4.shape:
         raise InputShapesNotEqual(
             f"Shapes of input images should be equal: {ndvi_image.shape}, {landsat_band_4.shape}"
         )
-    if emissivity_method == "xiaolei" and landsat_band_4 is None:
+    methods = (
+        [emissivity_method] if isinstance(emissivity_method, str) else emissivity_method
+    )
+    if "xiaolei" in methods and landsat_band_4 is None:
         raise ValueError(
-            f"The red band (landsat_band_4) has to be provided if {emissivity_method} is to be used"
+            "The red band (landsat_band_4) has to be provided if xiaolei is to be used"
         )
 
-    emissivity_10, emissivity_11 = Runner(algorithms=emissivity_algorithms)(
-        emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4
-    )
-    return emissivity_10, emissivity_11
+    if isinstance(emissivity_method, str):
+        emissivity_10, emissivity_11 = _emissivity_runner(
+            emissivity_method, ndvi=ndvi_image, red_band=landsat_band_4, dtype=dtype
+        )
+        return emissivity_10, emissivity_11
+
+    shared = Emissivity().shared_intermediates(ndvi_image, dtype=dtype)
+    return {
+        method: _emissivity_runner(
+            method, ndvi=ndvi_image, red_band=landsat_band_4, dtype=dtype, **shared
+        )
+        for method in methods
+    }
 
 
 def ndvi(landsat_band_5: np.ndarray, landsat_band_4: np.ndarray, mask: np.ndarray):
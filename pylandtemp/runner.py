@@ -13,8 +13,9 @@ class Runner:
         return compute_algorithm()(**kwargs)
 
     def _get_algorithm(self, algo):
-        if algo not in self.algorithms:
+        try:
+            return self.algorithms[algo]
+        except KeyError:
             raise ValueError(
-                f"Requested method not implemented. Choose among available methods: {list(self.algorithms.values())}"
-            )
-        return self.algorithms[algo]
+                f"Requested method not implemented. Choose among available methods: {list(self.algorithms)}"
+            ) from None
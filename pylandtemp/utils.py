@@ -23,15 +23,17 @@ def compute_ndvi(
         nir (np.ndarray): Near-infrared band image
         red (np.ndarray): Red-band image
         eps (float): Epsilon to avoid ZeroDivisionError in numpy
-        use_mask (bool): If True, mask NaN and 0 values in input images.
+        mask (np.ndarray[bool], optional): Output is NaN where mask is True. Defaults to None.
 
     Returns:
         np.ndarray: Normalized difference vegetation index
     """
     ndvi = (nir - red) / (nir + red + eps)
-    ndvi[abs(ndvi) > 1] = np.nan
+    # Out of range and masked pixels are combined so NaN is written in one masked pass
+    invalid = np.abs(ndvi) > 1
     if mask is not None:
-        ndvi[mask] = np.nan
+        invalid |= np.asarray(mask, dtype=bool)
+    np.copyto(ndvi, np.nan, where=invalid)
     return ndvi
 
 
@@ -43,9 +45,11 @@ def fractional_vegetation_cover(ndvi: np.ndarray) -> np.ndarray:
     Returns:
         np.ndarray: Fractional vegetation cover
     """
-    if len(ndvi.shape) != 2:
+    if ndvi.ndim != 2:
         raise ValueError("NDVI image should be 2-dimensional")
-    return ((ndvi - 0.2) / (0.5 - 0.2)) ** 2
+    fvc = np.subtract(ndvi, 0.2)
+    np.divide(fvc, 0.5 - 0.2, out=fvc)
+    return np.square(fvc, out=fvc)
 
 
 def cavity_effect(
@@ -87,4 +91,4 @@ def rescale_band(
     Returns:
         np.ndarray: rescaled image of same size as input
     """
-    return (mult * image) + 0.1
+    return (mult * image) + add
@@ -18,6 +18,9 @@ setup(
     install_requires=[
         "numpy",
     ],
+    extras_require={
+        "numba": ["numba"],
+    },
     keywords="Image processing, Landsat, Satellite images",
     classifiers=[
         "Development Status :: 3 - Alpha",
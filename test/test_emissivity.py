@@ -0,0 +1,240 @@
+import contextlib
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import unittest
+from unittest import mock
+
+from pylandtemp import emissivity
+from pylandtemp.emissivity import algorithms
+from pylandtemp.emissivity.emissivity import (
+    ComputeMonoWindowEmissivity,
+    ComputeEmissivityNBEM,
+    ComputeEmissivityGopinadh,
+)
+
+
+def _numpy_backend():
+    # Disables the compiled kernels so the numpy implementations are exercised
+    return mock.patch.multiple(
+        algorithms,
+        mono_window_kernel=None,
+        nbem_kernel=None,
+        gopinadh_kernel=None,
+    )
+
+
+class TestEmissivity(unittest.TestCase):
+    ndvi = np.array(
+        [[-1.0, 0.1, 0.2, 0.35], [0.5, 0.7, 1.0, np.nan]],
+    )
+    red_band = np.full((2, 4), 10000.0)
+
+    def test_that_landcover_labels_follow_ndvi_thresholds(self):
+        ndvi = np.array([[-1.5, -1.0, 0.1, 0.2, 0.35], [0.5, 0.7, 1.0, 1.5, np.nan]])
+        labels = ComputeMonoWindowEmissivity()._get_land_surface_mask(ndvi)
+        np.testing.assert_array_equal(labels, [[0, 1, 1, 2, 2], [2, 3, 3, 4, 4]])
+        labels = ComputeMonoWindowEmissivity()._get_land_surface_mask(
+            ndvi.astype(np.float32)
+        )
+        np.testing.assert_array_equal(labels, [[0, 1, 1, 2, 2], [2, 3, 3, 4, 4]])
+
+    def test_mono_window_emissivity_values(self):
+        emm_10, _ = ComputeMonoWindowEmissivity()(
+            ndvi=self.ndvi, red_band=self.red_band
+        )
+        expected = [
+            [0.97, 0.97, 0.986, 0.987],
+            [0.99, 0.99, 0.99, np.nan],
+        ]
+        np.testing.assert_allclose(emm_10, expected)
+
+    def test_that_output_and_input_size_equal(self):
+        for algorithm in (
+            ComputeMonoWindowEmissivity,
+            ComputeEmissivityNBEM,
+            ComputeEmissivityGopinadh,
+        ):
+            emm_10, emm_11 = algorithm()(ndvi=self.ndvi, red_band=self.red_band)
+            self.assertEqual(self.ndvi.shape, emm_10.shape)
+            self.assertEqual(self.ndvi.shape, emm_11.shape)
+
+    def test_that_nan_ndvi_gives_nan_emissivity(self):
+        for algorithm in (
+            ComputeMonoWindowEmissivity,
+            ComputeEmissivityNBEM,
+            ComputeEmissivityGopinadh,
+        ):
+            emm_10, emm_11 = algorithm()(ndvi=self.ndvi, red_band=self.red_band)
+            self.assertTrue(np.isnan(emm_10[1, 3]))
+            self.assertTrue(np.isnan(emm_11[1, 3]))
+            self.assertEqual(np.isnan(emm_10).sum(), 1)
+
+    def test_that_float32_inputs_give_float32_outputs(self):
+        red_band = np.full((2, 4), 10000, dtype=np.uint16)
+        # The compiled kernels are used when numba is installed, the numpy path otherwise
+        for backend in (contextlib.nullcontext, _numpy_backend):
+            for algorithm in (
+                ComputeMonoWindowEmissivity,
+                ComputeEmissivityNBEM,
+                ComputeEmissivityGopinadh,
+            ):
+                with backend():
+                    emm_10, emm_11 = algorithm()(
+                        ndvi=self.ndvi, red_band=red_band, dtype=np.float32
+                    )
+                self.assertEqual(emm_10.dtype, np.float32)
+                self.assertEqual(emm_11.dtype, np.float32)
+
+    @unittest.skipUnless(
+        algorithms.mono_window_kernel is not None, "numba is not installed"
+    )
+    def test_that_compiled_and_numpy_paths_agree(self):
+        ndvi = np.linspace(-1, 1, 64).reshape(8, 8)
+        red_band = np.linspace(0, 30000, 64).reshape(8, 8)
+        for algorithm in (
+            ComputeMonoWindowEmissivity,
+            ComputeEmissivityNBEM,
+            ComputeEmissivityGopinadh,
+        ):
+            compiled = algorithm()(ndvi=ndvi, red_band=red_band)
+            with _numpy_backend():
+                reference = algorithm()(ndvi=ndvi, red_band=red_band)
+            for emm, expected in zip(compiled, reference):
+                np.testing.assert_allclose(emm, expected)
+
+    def test_that_tiled_and_single_block_results_agree(self):
+        ndvi = np.linspace(-1, 1, 77).reshape(7, 11)
+        red_band = np.linspace(0, 30000, 77).reshape(7, 11)
+        with _numpy_backend():
+            for algorithm in (
+                ComputeMonoWindowEmissivity,
+                ComputeEmissivityNBEM,
+                ComputeEmissivityGopinadh,
+            ):
+                reference = algorithm()(ndvi=ndvi, red_band=red_band)
+                tiled_algorithm = algorithm()
+                tiled_algorithm.tile_pixels = 9
+                tiled_algorithm.num_workers = 4
+                tiled = tiled_algorithm(ndvi=ndvi, red_band=red_band)
+                for emm, expected in zip(tiled, reference):
+                    np.testing.assert_allclose(emm, expected)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "fork is not available")
+    def test_that_tiles_run_in_a_forked_child(self):
+        # Runs in a fresh interpreter: a process that already ran numba's parallel
+        # kernels in other tests can hang after fork regardless of the tile pools.
+        script = textwrap.dedent("""
+            import multiprocessing
+            from unittest import mock
+
+            import numpy as np
+
+            from pylandtemp.emissivity import algorithms
+
+            def run():
+                algorithm = algorithms.ComputeEmissivityNBEM()
+                algorithm.tile_pixels = 16
+                algorithm.num_workers = 4
+                algorithm(
+                    ndvi=np.linspace(-1, 1, 400).reshape(20, 20),
+                    red_band=np.linspace(0, 30000, 400).reshape(20, 20),
+                )
+
+            with mock.patch.object(algorithms, "nbem_kernel", None):
+                # The first call creates the thread pool the child inherits
+                run()
+                child = multiprocessing.get_context("fork").Process(target=run)
+                child.start()
+                child.join(timeout=20)
+                if child.is_alive():
+                    child.kill()
+                    raise SystemExit("Tiled computation hung in a forked child")
+                raise SystemExit(child.exitcode)
+            """)
+        package_root = os.path.dirname(
+            os.path.dirname(os.path.dirname(algorithms.__file__))
+        )
+        env = dict(os.environ, PYTHONPATH=package_root)
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_that_invalid_inputs_raise(self):
+        algorithm = ComputeMonoWindowEmissivity()
+        with self.assertRaises(ValueError):
+            algorithm(ndvi=self.ndvi.ravel(), red_band=self.red_band.ravel())
+        with self.assertRaises(ValueError):
+            algorithm(ndvi=self.ndvi, red_band=self.red_band[:1])
+        with self.assertRaises(ValueError):
+            algorithm(ndvi=self.ndvi, red_band=self.red_band, dtype=np.int32)
+
+    def test_that_non_contiguous_inputs_are_accepted(self):
+        emm_10, _ = ComputeMonoWindowEmissivity()(
+            ndvi=np.asfortranarray(self.ndvi), red_band=self.red_band
+        )
+        expected, _ = ComputeMonoWindowEmissivity()(
+            ndvi=self.ndvi, red_band=self.red_band
+        )
+        np.testing.assert_allclose(emm_10, expected)
+
+    def test_that_multi_method_run_matches_single_method_runs(self):
+        ndvi = np.linspace(-1, 1, 77).reshape(7, 11)
+        red_band = np.linspace(0, 30000, 77).reshape(7, 11)
+        methods = ["gopinadh", "xiaolei", "avdan"]
+        with _numpy_backend():
+            results = emissivity(ndvi, red_band, emissivity_method=methods)
+            for method in methods:
+                expected = emissivity(ndvi, red_band, emissivity_method=method)
+                for emm, reference in zip(results[method], expected):
+                    np.testing.assert_allclose(emm, reference)
+
+    def test_that_dtype_is_passed_through_the_public_interface(self):
+        emm_10, _ = emissivity(self.ndvi, self.red_band, dtype=np.float32)
+        self.assertEqual(emm_10.dtype, np.float32)
+        results = emissivity(
+            self.ndvi, self.red_band, emissivity_method=["avdan"], dtype=np.float32
+        )
+        self.assertEqual(results["avdan"][0].dtype, np.float32)
+
+    def test_that_shared_intermediates_are_not_reused_across_calls(self):
+        ndvi = np.full((4, 4), 0.9)
+        red_band = np.full((4, 4), 10000.0)
+        methods = ["gopinadh", "avdan"]
+        with _numpy_backend():
+            emissivity(ndvi, red_band, emissivity_method=methods)
+            ndvi[:] = 0.3
+            results = emissivity(ndvi, red_band, emissivity_method=methods)
+            expected = emissivity(ndvi, red_band, emissivity_method="gopinadh")
+        np.testing.assert_allclose(results["gopinadh"][0], expected[0])
+
+    def test_that_tiles_read_precomputed_intermediates(self):
+        ndvi = np.linspace(-1, 1, 77).reshape(7, 11)
+        red_band = np.linspace(0, 30000, 77).reshape(7, 11)
+        with _numpy_backend():
+            shared = algorithms.Emissivity().shared_intermediates(ndvi)
+            fvc = shared["fvc"].copy()
+            for algorithm in (
+                ComputeMonoWindowEmissivity,
+                ComputeEmissivityNBEM,
+                ComputeEmissivityGopinadh,
+            ):
+                reference = algorithm()(ndvi=ndvi, red_band=red_band)
+                tiled = algorithm()
+                tiled.tile_pixels = 9
+                evaluated = tiled(ndvi=ndvi, red_band=red_band, **shared)
+                for emm, expected in zip(evaluated, reference):
+                    np.testing.assert_allclose(emm, expected)
+            np.testing.assert_array_equal(shared["fvc"], fvc)
+
+
+if __name__ == "__main__":
+    unittest.main()
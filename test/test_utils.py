@@ -0,0 +1,30 @@
+import numpy as np
+import unittest
+
+from pylandtemp.utils import cavity_effect, compute_ndvi, rescale_band
+
+
+class TestUtils(unittest.TestCase):
+    def test_that_cavity_effect_accepts_scalars(self):
+        self.assertAlmostEqual(cavity_effect(0.98, 0.97, 0.5), 0.008085)
+
+    def test_that_rescale_band_accepts_scalars(self):
+        self.assertAlmostEqual(rescale_band(5000), 0.2)
+
+    def test_that_rescale_band_uses_additive_factor(self):
+        image = np.array([[0.0, 5000.0]])
+        np.testing.assert_allclose(rescale_band(image, add=-0.2), [[-0.2, -0.1]])
+
+    def test_that_ndvi_is_nan_where_out_of_range_or_masked(self):
+        nir = np.array([[3.0, 2.0], [1.0, 1.0]])
+        red = np.array([[1.0, -5.0], [1.0, 3.0]])
+        mask = np.array([[False, False], [True, False]])
+        expected = [[0.5, np.nan], [np.nan, -0.5]]
+        np.testing.assert_allclose(compute_ndvi(nir, red, mask=mask), expected)
+        np.testing.assert_allclose(
+            compute_ndvi(nir, red, mask=mask.astype(int)), expected
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()